@@ -0,0 +1,71 @@
+"""Unit tests for the classifier."""
+
+import unittest
+
+import torch
+from torch import nn
+
+from udtube import modules
+
+
+class ClassifierTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_loads_unfused_heads(self):
+        # Simulates a checkpoint written before the heads were fused, with
+        # one linear layer per active head.
+        hidden_size = 8
+        out_sizes = {"upos": 3, "lemma": 5, "feats": 4}
+        old_heads = {
+            name: nn.Linear(hidden_size, out_size)
+            for name, out_size in out_sizes.items()
+        }
+        state_dict = {}
+        for name, head in old_heads.items():
+            state_dict[f"{name}_head.weight"] = head.weight
+            state_dict[f"{name}_head.bias"] = head.bias
+        classifier = modules.UDTubeClassifier(
+            hidden_size,
+            use_xpos=False,
+            upos_out_size=out_sizes["upos"],
+            lemma_out_size=out_sizes["lemma"],
+            feats_out_size=out_sizes["feats"],
+        )
+        classifier.load_state_dict(state_dict)
+        encodings = torch.randn(2, 6, hidden_size)
+        with torch.no_grad():
+            logits = classifier(encodings)
+            for name, head in old_heads.items():
+                torch.testing.assert_close(
+                    getattr(logits, name), head(encodings).permute(0, 2, 1)
+                )
+        self.assertIsNone(logits.xpos)
+
+    def test_initializes_like_unfused_heads(self):
+        # The fused head should draw the same initial weights, in the same
+        # order, as one linear layer per active head.
+        hidden_size = 8
+        out_sizes = [3, 2, 5, 4]
+        classifier = modules.UDTubeClassifier(
+            hidden_size,
+            upos_out_size=out_sizes[0],
+            xpos_out_size=out_sizes[1],
+            lemma_out_size=out_sizes[2],
+            feats_out_size=out_sizes[3],
+        )
+        torch.manual_seed(42)
+        old_heads = [
+            nn.Linear(hidden_size, out_size) for out_size in out_sizes
+        ]
+        torch.testing.assert_close(
+            classifier.head.weight,
+            torch.cat([head.weight for head in old_heads]),
+        )
+        torch.testing.assert_close(
+            classifier.head.bias, torch.cat([head.bias for head in old_heads])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Unit tests for subword-to-word pooling."""
+
+import unittest
+
+import torch
+
+from udtube import modules
+from udtube.data import collators
+
+
+class PoolingTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+
+    @staticmethod
+    def _naive_pool(
+        embeddings: torch.Tensor, word_ids: torch.Tensor, word_counts
+    ) -> torch.Tensor:
+        # Plain per-word mean; words without subwords are zero vectors.
+        pooled = torch.zeros(
+            len(word_counts), max(word_counts), embeddings.size(-1)
+        )
+        for i, count in enumerate(word_counts):
+            for word in range(count):
+                mask = word_ids[i] == word
+                if mask.any():
+                    pooled[i, word] = embeddings[i, mask].mean(dim=0)
+        return pooled
+
+    def assertPoolsCorrectly(self, word_ids, word_counts):
+        word_ids = torch.tensor(word_ids)
+        embeddings = torch.randn(*word_ids.shape, 5)
+        pooled = modules.UDTubeEncoder._group_embeddings(
+            embeddings,
+            *collators.Collator._pooling_indices(word_ids, word_counts),
+            word_counts,
+        )
+        expected = self._naive_pool(embeddings, word_ids, word_counts)
+        self.assertEqual(pooled.shape, expected.shape)
+        torch.testing.assert_close(pooled, expected)
+
+    def test_single_subword_words(self):
+        self.assertPoolsCorrectly([[0, 1, 2]], [3])
+
+    def test_multi_subword_words(self):
+        self.assertPoolsCorrectly([[0, 0, 1, 2, 2, 2]], [3])
+
+    def test_padding_and_different_lengths(self):
+        self.assertPoolsCorrectly(
+            [
+                [0, 0, 1, 2, 3, 3, 4],
+                [0, 1, 1, -1, -1, -1, -1],
+                [0, 1, 2, 2, 2, -1, -1],
+            ],
+            [5, 2, 3],
+        )
+
+    def test_word_without_subwords(self):
+        # Word 1 of the first sentence and the final word of the second
+        # sentence have no subwords.
+        word_ids = [[0, 0, 2, 3, -1], [0, 1, 1, 2, 2]]
+        word_counts = [4, 4]
+        self.assertPoolsCorrectly(word_ids, word_counts)
+        pooled = modules.UDTubeEncoder._group_embeddings(
+            torch.randn(2, 5, 5),
+            *collators.Collator._pooling_indices(
+                torch.tensor(word_ids), word_counts
+            ),
+            word_counts,
+        )
+        self.assertTrue(torch.equal(pooled[0, 1], torch.zeros(5)))
+        self.assertTrue(torch.equal(pooled[1, 3], torch.zeros(5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Unit tests for datasets."""
+
+import os
+import unittest
+from typing import List
+
+from parameterized import parameterized
+from torch.utils import data as torch_data
+
+from udtube import data
+from udtube.data import datasets
+
+# Directory the unit test is located in, relative to the working directory.
+DIR = os.path.relpath(os.path.dirname(__file__), os.getcwd())
+TRAIN_PATH = os.path.join(DIR, "testdata/en_train.conllu")
+
+
+def _collate(items: List[datasets.Item]) -> List[List[str]]:
+    return [item.get_tokens() for item in items]
+
+
+class ConlluIterDatasetTest(unittest.TestCase):
+    @parameterized.expand([(1, 3), (2, 3), (2, 1), (3, 4)])
+    def test_workers_yield_each_sentence_once(
+        self, num_workers: int, batch_size: int
+    ):
+        expected = [
+            tokenlist.get_tokens()
+            for tokenlist in data.parse_from_path(TRAIN_PATH)
+        ]
+        loader = torch_data.DataLoader(
+            datasets.ConlluIterDataset(TRAIN_PATH, batch_size),
+            collate_fn=_collate,
+            batch_size=batch_size,
+            num_workers=num_workers,
+        )
+        actual = [sentence for batch in loader for sentence in batch]
+        # The sentences are also expected to remain in order.
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""Unit tests for samplers."""
+
+import unittest
+
+import torch
+
+from udtube.data import samplers
+
+
+class LengthBucketSamplerTest(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_permutation(self):
+        lengths = [7, 3, 12, 1, 5, 9, 2, 8, 4, 11, 6]
+        sampler = samplers.LengthBucketSampler(lengths, 3, bucket_size=2)
+        indices = list(sampler)
+        self.assertEqual(len(sampler), len(indices))
+        self.assertEqual(sorted(indices), list(range(len(lengths))))
+
+    def test_batches_sorted_within_bucket(self):
+        # With a single bucket, the full ordering is a shuffle of batches
+        # cut from the sorted lengths.
+        lengths = [7, 3, 12, 1, 5, 9, 2, 8, 4, 11, 6, 10]
+        sampler = samplers.LengthBucketSampler(lengths, 4, bucket_size=3)
+        indices = list(sampler)
+        batches = [
+            sorted(lengths[index] for index in indices[i : i + 4])
+            for i in range(0, len(indices), 4)
+        ]
+        self.assertCountEqual(
+            batches, [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]]
+        )
+
+    def test_short_batch_last(self):
+        lengths = [5, 1, 4, 2, 3]
+        sampler = samplers.LengthBucketSampler(lengths, 2)
+        indices = list(sampler)
+        # The longest sentence ends up alone in the final batch.
+        self.assertEqual(lengths[indices[-1]], 5)
+
+    def test_empty(self):
+        self.assertEqual(list(samplers.LengthBucketSampler([], 4)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -113,8 +113,9 @@ class PredictionWriter(callbacks.BasePredictionWriter):
             except StopIteration:
                 # Prevents the error from being caught by Lightning.
                 logging.error(
-                    f"Length mismatch at tag {attr!r} (sent_id: "
-                    f"{tokenlist.metadata.get('sent_id')})"
+                    "Length mismatch at tag %r (sent_id: %s)",
+                    attr,
+                    tokenlist.metadata.get("sent_id"),
                 )
                 continue
 
@@ -65,7 +65,7 @@ def main() -> None:
     logging.basicConfig(
         format="%(filename)s %(levelname)s: %(asctime)s - %(message)s",
         datefmt="%d-%b-%y %H:%M:%S",
-        level="INFO",
+        level=logging.INFO,
     )
     UDTubeCLI(
         models.UDTube,
@@ -7,9 +7,10 @@ Adapted from Yoyodyne:
 However, there is no need for padding at this stage.
 """
 
+from __future__ import annotations
+
 from typing import List, Optional
 
-import tokenizers
 import torch
 from torch import nn
 
@@ -23,7 +24,12 @@ class Batch(nn.Module):
 
     Args:
         tokenlists: list of TokenLists.
-        tokens: batch encoding from the transformer.
+        input_ids: padded tensor of subword indices.
+        attention_mask: padded tensor of subword masks.
+        subword_indices: flattened indices of the non-padding subwords.
+        word_offsets: offset into `subword_indices` of the first subword of
+            each word.
+        word_counts: number of words in each sentence.
         pos: optional padded tensor of universal POS labels.
         xpos: optional padded tensor of language-specific POS labels.
         lemma: optional padded tensor of lemma labels.
@@ -33,7 +39,9 @@ class Batch(nn.Module):
     tokenlists: List[conllu.TokenList]
     input_ids: torch.Tensor
     attention_mask: torch.Tensor
-    encodings: List[tokenizers.Encoding]
+    subword_indices: torch.Tensor
+    word_offsets: torch.Tensor
+    word_counts: List[int]
     upos: Optional[torch.Tensor]
     xpos: Optional[torch.Tensor]
     lemma: Optional[torch.Tensor]
@@ -44,7 +52,9 @@ class Batch(nn.Module):
         tokenlists,
         input_ids,
         attention_mask,
-        encodings,
+        subword_indices,
+        word_offsets,
+        word_counts,
         upos=None,
         xpos=None,
         lemma=None,
@@ -54,7 +64,9 @@ class Batch(nn.Module):
         self.tokenlists = tokenlists
         self.register_buffer("input_ids", input_ids)
         self.register_buffer("attention_mask", attention_mask)
-        self.encodings = encodings
+        self.register_buffer("subword_indices", subword_indices)
+        self.register_buffer("word_offsets", word_offsets)
+        self.word_counts = word_counts
         self.register_buffer("upos", upos)
         self.register_buffer("xpos", xpos)
         self.register_buffer("lemma", lemma)
@@ -76,5 +88,15 @@ class Batch(nn.Module):
     def use_feats(self) -> bool:
         return self.feats is not None
 
+    def pin_memory(self) -> Batch:
+        """Copies the tensors into pinned memory.
+
+        This is called by the data loader when memory pinning is enabled.
+
+        Returns:
+            The batch.
+        """
+        return self._apply(lambda tensor: tensor.pin_memory())
+
     def __len__(self) -> int:
         return len(self.tokenlists)
@@ -2,8 +2,9 @@
 
 import dataclasses
 import logging
-from typing import Any, Iterable, List
+from typing import Any, Iterable, List, Optional, Tuple
 
+import tokenizers
 import torch
 from torch import nn
 import transformers
@@ -18,26 +19,37 @@ class Error(Exception):
 
 @dataclasses.dataclass
 class Collator:
-    """Collator for CoNLL-U data."""
+    """Collator for CoNLL-U data.
+
+    Args:
+        tokenizer: the Hugging Face tokenizer.
+        max_length: the maximum length, in subwords, the encoder accepts, or
+            None if it has no known limit.
+    """
 
     tokenizer: transformers.AutoTokenizer
+    max_length: Optional[int]
 
     def __call__(self, itemlist: List[datasets.Item]) -> batches.Batch:
-        # Runs the tokenizer.
+        # Runs the tokenizer. Sequences are truncated to one subword beyond
+        # the encoder's max length, so over-long sequences can still be
+        # detected without padding the whole batch to their full length.
+        # Without a known limit, there is nothing to truncate to; passing the
+        # tokenizer's placeholder limit would overflow.
+        has_max_length = self.max_length is not None
         tokenized = self.tokenizer(
             [item.get_tokens() for item in itemlist],
             padding="longest",
-            truncation=False,
+            truncation=has_max_length,
+            max_length=self.max_length + 1 if has_max_length else None,
             return_tensors="pt",
             is_split_into_words=True,
             add_special_tokens=False,
         )
-        actual_length = tokenized.input_ids.size(1)
-        max_length = self.tokenizer.model_max_length
-        if actual_length > max_length:
+        if has_max_length and tokenized.input_ids.size(1) > self.max_length:
             # By construction, a sequence is too long if the first element
             # beyond the encoder's max length is not padding.
-            keep_items = tokenized.input_ids[:, max_length] == special.PAD_IDX
+            keep_items = tokenized.attention_mask[:, self.max_length] == 0
             # Ideally we'd just shorten the tag tensors, but mapping subword
             # tokens to tags is sufficiently complex that we don't know at
             # this stage how many tags to keep or get rid of. Therefore we
@@ -46,7 +58,7 @@ class Collator:
                 "Discarding %d sequence(s) exceeding the encoder's "
                 "maximum length (%d)",
                 torch.sum(~keep_items),
-                max_length,
+                self.max_length,
             )
             itemlist = self._keep_list(itemlist, keep_items)
             # In the very unlikely case that every sequence in the batch
@@ -55,22 +67,30 @@ class Collator:
             if not itemlist:
                 raise Error(
                     "Every sequence in the batch exceeds the "
-                    f"encoder's maximum length {max_length}"
+                    f"encoder's maximum length {self.max_length}"
                 )
             # Not all of these have setters, so we store pointers instead.
-            input_ids = tokenized.input_ids[keep_items, :max_length]
-            attention_mask = tokenized.attention_mask[keep_items, :max_length]
+            input_ids = tokenized.input_ids[keep_items, : self.max_length]
+            attention_mask = tokenized.attention_mask[
+                keep_items, : self.max_length
+            ]
             encodings = self._keep_list(tokenized.encodings, keep_items)
         else:
             # Grabs pointers.
             input_ids = tokenized.input_ids
             attention_mask = tokenized.attention_mask
             encodings = tokenized.encodings
+        word_counts = [len(item.get_tokens()) for item in itemlist]
+        subword_indices, word_offsets = self._pooling_indices(
+            self._word_ids(encodings, input_ids.size(1)), word_counts
+        )
         return batches.Batch(
             tokenlists=[item.tokenlist for item in itemlist],
             input_ids=input_ids,
             attention_mask=attention_mask,
-            encodings=encodings,
+            subword_indices=subword_indices,
+            word_offsets=word_offsets,
+            word_counts=word_counts,
             # Pads and stacks data for whichever classification tasks are
             # enabled.
             upos=(
@@ -95,6 +115,60 @@ class Collator:
             ),
         )
 
+    @staticmethod
+    def _word_ids(
+        encodings: List[tokenizers.Encoding], length: int
+    ) -> torch.Tensor:
+        """Tensorizes the subword-to-word mapping.
+
+        Args:
+            encodings: the tokenizer encodings.
+            length: the padded length of the subword tensors.
+
+        Returns:
+            A tensor of shape N x L giving the index of the word each subword
+            belongs to, with -1 for padding.
+        """
+        return torch.tensor(
+            [
+                [
+                    -1 if word_id is None else word_id
+                    for word_id in encoding.word_ids[:length]
+                ]
+                for encoding in encodings
+            ],
+            dtype=torch.long,
+        )
+
+    @staticmethod
+    def _pooling_indices(
+        word_ids: torch.Tensor, word_counts: List[int]
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Computes the bags used to mean-pool subwords into words.
+
+        Each word is treated as a bag of rows in the flattened N * L
+        subword embedding matrix; a word with no subwords is an empty bag.
+
+        Args:
+            word_ids: a tensor of shape N x L giving the index of the word
+                each subword belongs to, with -1 for padding.
+            word_counts: the number of words in each sentence.
+
+        Returns:
+            A tuple of the flattened indices of the non-padding subwords and
+            the offset of the first subword of each word in the batch.
+        """
+        mask = word_ids >= 0
+        subword_indices = mask.flatten().nonzero().squeeze(1)
+        # Makes the word indices unique across the batch.
+        sentence_starts = torch.tensor([0] + word_counts[:-1]).cumsum(0)
+        batch_word_ids = (word_ids + sentence_starts.unsqueeze(1))[mask]
+        subword_counts = torch.bincount(
+            batch_word_ids, minlength=sum(word_counts)
+        )
+        word_offsets = subword_counts.cumsum(0) - subword_counts
+        return subword_indices, word_offsets
+
     @staticmethod
     def _keep_list(items: List[Any], keep_items: Iterable[bool]) -> List[Any]:
         """Simulates items[keep_items] for lists.
@@ -122,12 +196,6 @@ class Collator:
         Returns:
             The padded and stacked tensor.
         """
-        pad_max = max(len(tensor) for tensor in tensorlist)
-        return torch.stack(
-            [
-                nn.functional.pad(
-                    tensor, (0, pad_max - len(tensor)), value=special.PAD_IDX
-                )
-                for tensor in tensorlist
-            ]
+        return nn.utils.rnn.pad_sequence(
+            tensorlist, batch_first=True, padding_value=special.PAD_IDX
         )
@@ -4,11 +4,13 @@ import os
 from typing import Optional
 
 import lightning
+import torch
 import transformers
 from torch.utils import data
+from transformers import tokenization_utils_base
 
-from .. import defaults
-from . import collators, conllu, datasets, indexes, mappers
+from .. import defaults, encoders
+from . import batches, collators, conllu, datasets, indexes, mappers, samplers
 
 
 class Error(Exception):
@@ -36,6 +38,8 @@ class DataModule(lightning.LightningDataModule):
         use_lemma: Enables the lemmatization task.
         use_feats: Enables the morphological feature tagging task.
         batch_size: Batch size.
+        num_workers: Number of data loader worker processes; tokenization and
+            the subword-to-word bookkeeping run in these workers.
     """
 
     predict: Optional[str]
@@ -48,8 +52,10 @@ class DataModule(lightning.LightningDataModule):
     use_lemma: bool
     use_feats: bool
     batch_size: int
+    num_workers: int
     index: indexes.Index
     tokenizer: transformers.AutoTokenizer
+    max_length: Optional[int]
 
     def __init__(
         self,
@@ -69,6 +75,7 @@ class DataModule(lightning.LightningDataModule):
         use_feats: bool = defaults.USE_FEATS,
         # Other.
         batch_size: int = defaults.BATCH_SIZE,
+        num_workers: int = defaults.NUM_WORKERS,
     ):
         super().__init__()
         self.train = train
@@ -81,6 +88,7 @@ class DataModule(lightning.LightningDataModule):
         self.use_lemma = use_lemma
         self.use_feats = use_feats
         self.batch_size = batch_size
+        self.num_workers = num_workers
         # If the training data is specified, it is used to create (or recreate)
         # the index; if not specified it is read from the model directory.
         self.index = (
@@ -95,6 +103,7 @@ class DataModule(lightning.LightningDataModule):
             clean_up_tokenization_spaces=False,
             add_prefix_space=True,
         )
+        self.max_length = self._max_length(encoder)
 
     # Based on: https://universaldependencies.org/u/pos/index.html.
 
@@ -161,6 +170,22 @@ class DataModule(lightning.LightningDataModule):
         index.write(model_dir)
         return index
 
+    def _max_length(self, encoder: str) -> Optional[int]:
+        # The tokenizer's limit may be unset (and thus absurdly large) or may
+        # be smaller than the number of position embeddings (e.g., RoBERTa
+        # reserves some positions), so we take the tighter of the two.
+        config = encoders.load_config(encoder)
+        max_length = min(
+            self.tokenizer.model_max_length,
+            getattr(config, "max_position_embeddings", None)
+            or tokenization_utils_base.VERY_LARGE_INTEGER,
+        )
+        # Encoders with no known limit (e.g., those with relative position
+        # embeddings) are neither truncated nor checked for length.
+        if max_length >= tokenization_utils_base.VERY_LARGE_INTEGER:
+            return None
+        return max_length
+
     # Properties.
 
     @property
@@ -183,49 +208,66 @@ class DataModule(lightning.LightningDataModule):
 
     def train_dataloader(self) -> data.DataLoader:
         assert self.train is not None, "no train path"
+        dataset = self._conllu_map_dataset(self.train)
         return data.DataLoader(
-            self._conllu_map_dataset(self.train),
-            collate_fn=collators.Collator(self.tokenizer),
+            dataset,
+            collate_fn=collators.Collator(self.tokenizer, self.max_length),
             batch_size=self.batch_size,
-            shuffle=True,
-            num_workers=1,
-            persistent_workers=True,
+            # Groups sentences of similar length to reduce padding. Length
+            # in words is used as a cheap proxy for length in subwords.
+            sampler=samplers.LengthBucketSampler(
+                [len(tokenlist.get_tokens()) for tokenlist in dataset.samples],
+                self.batch_size,
+            ),
+            num_workers=self.num_workers,
+            persistent_workers=self.num_workers > 0,
+            pin_memory=torch.cuda.is_available(),
         )
 
     def val_dataloader(self) -> data.DataLoader:
         assert self.train is not None, "no val path"
         return data.DataLoader(
             self._conllu_map_dataset(self.val),
-            collate_fn=collators.Collator(self.tokenizer),
+            collate_fn=collators.Collator(self.tokenizer, self.max_length),
             batch_size=self.batch_size,
             shuffle=False,
-            num_workers=1,
-            persistent_workers=True,
+            num_workers=self.num_workers,
+            persistent_workers=self.num_workers > 0,
+            pin_memory=torch.cuda.is_available(),
         )
 
     def predict_dataloader(self) -> data.DataLoader:
         assert self.predict is not None, "no predict path"
         return data.DataLoader(
             # This one uses an iterative data loader instead.
-            datasets.ConlluIterDataset(self.predict),
-            collate_fn=collators.Collator(self.tokenizer),
+            datasets.ConlluIterDataset(self.predict, self.batch_size),
+            collate_fn=collators.Collator(self.tokenizer, self.max_length),
             batch_size=self.batch_size,
             shuffle=False,
-            num_workers=1,
-            persistent_workers=True,
+            num_workers=self.num_workers,
+            persistent_workers=self.num_workers > 0,
+            pin_memory=torch.cuda.is_available(),
         )
 
     def test_dataloader(self) -> data.DataLoader:
         assert self.test is not None, "no test path"
         return data.DataLoader(
             self._conllu_map_dataset(self.test),
-            collate_fn=collators.Collator(self.tokenizer),
+            collate_fn=collators.Collator(self.tokenizer, self.max_length),
             batch_size=self.batch_size,
             shuffle=False,
-            num_workers=1,
-            persistent_workers=True,
+            num_workers=self.num_workers,
+            persistent_workers=self.num_workers > 0,
+            pin_memory=torch.cuda.is_available(),
         )
 
+    def transfer_batch_to_device(
+        self, batch: batches.Batch, device: torch.device, dataloader_idx: int
+    ) -> batches.Batch:
+        # Since the batch is in pinned memory, the copy need not block the
+        # host.
+        return batch.to(device, non_blocking=True)
+
     def _conllu_map_dataset(self, path: str) -> datasets.ConlluMapDataset:
         return datasets.ConlluMapDataset(
             list(conllu.parse_from_path(path)),
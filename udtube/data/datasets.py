@@ -64,15 +64,27 @@ class ConlluIterDataset(data.IterableDataset):
 
     CoNLL-U fields other than `text` are simply ignored.
 
+    When loaded with multiple workers, each worker yields every n-th run of
+    `batch_size` sentences, so that the data loader, which takes batches from
+    the workers in turn, yields each sentence once and in the original order.
+
     Args:
         path: path to input CoNLL-U file.
+        batch_size: batch size of the data loader.
     """
 
     path: str
+    batch_size: int = 1
 
     def __iter__(self) -> Iterator[Item]:
-        for tokenlist in conllu.parse_from_path(self.path):
-            yield Item(tokenlist)
+        worker_info = data.get_worker_info()
+        if worker_info is None:
+            num_workers, worker_id = 1, 0
+        else:
+            num_workers, worker_id = worker_info.num_workers, worker_info.id
+        for index, tokenlist in enumerate(conllu.parse_from_path(self.path)):
+            if (index // self.batch_size) % num_workers == worker_id:
+                yield Item(tokenlist)
 
 
 @dataclasses.dataclass
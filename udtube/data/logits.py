@@ -1,27 +1,19 @@
 """Logits object."""
 
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import torch
-from torch import nn
 
 
-class Logits(nn.Module):
+class Logits(NamedTuple):
     """Logits from the classifier forward pass.
 
     Each tensor is either null or of shape N x C x L."""
 
-    upos: Optional[torch.Tensor]
-    xpos: Optional[torch.Tensor]
-    lemma: Optional[torch.Tensor]
-    feats: Optional[torch.Tensor]
-
-    def __init__(self, upos=None, xpos=None, lemma=None, feats=None):
-        super().__init__()
-        self.register_buffer("upos", upos)
-        self.register_buffer("xpos", xpos)
-        self.register_buffer("lemma", lemma)
-        self.register_buffer("feats", feats)
+    upos: Optional[torch.Tensor] = None
+    xpos: Optional[torch.Tensor] = None
+    lemma: Optional[torch.Tensor] = None
+    feats: Optional[torch.Tensor] = None
 
     @property
     def use_upos(self) -> bool:
@@ -0,0 +1,63 @@
+"""Samplers.
+
+Batches are padded to the length of their longest sentence, so batches whose
+sentences are of similar length waste less of the encoder's computation on
+padding.
+"""
+
+from typing import Iterator, List
+
+import torch
+from torch.utils import data
+
+
+class LengthBucketSampler(data.Sampler[int]):
+    """Shuffling sampler which groups sentences of similar length.
+
+    The indices are shuffled and split into buckets of `batch_size *
+    bucket_size` samples. Each bucket is sorted by length and cut into
+    batches, and then the batches are shuffled. Consecutive runs of
+    `batch_size` indices therefore have similar lengths, but the order of
+    batches remains random. Only the final batch may be short, so it is
+    always yielded last to keep the batches aligned with those formed by the
+    data loader.
+
+    Args:
+        lengths: length of each sample.
+        batch_size: batch size.
+        bucket_size: number of batches per bucket.
+    """
+
+    lengths: List[int]
+    batch_size: int
+    bucket_size: int
+
+    def __init__(
+        self, lengths: List[int], batch_size: int, bucket_size: int = 100
+    ):
+        super().__init__()
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __iter__(self) -> Iterator[int]:
+        indices = torch.randperm(len(self.lengths)).tolist()
+        bucket_length = self.batch_size * self.bucket_size
+        batches = []
+        for start in range(0, len(indices), bucket_length):
+            bucket = sorted(
+                indices[start : start + bucket_length],
+                key=lambda index: self.lengths[index],
+            )
+            batches.extend(
+                bucket[i : i + self.batch_size]
+                for i in range(0, len(bucket), self.batch_size)
+            )
+        if not batches:
+            return
+        for batch in torch.randperm(len(batches) - 1).tolist():
+            yield from batches[batch]
+        yield from batches[-1]
@@ -5,10 +5,13 @@ from torch import optim
 from . import schedulers
 
 BATCH_SIZE = 32
+NUM_WORKERS = 1
 
 DROPOUT = 0.5
 ENCODER = "google-bert/bert-base-multilingual-cased"
 POOLING_LAYERS = 4
+COMPILE_POOLING = False
+GRADIENT_CHECKPOINTING = False
 REVERSE_EDITS = True
 USE_UPOS = True
 USE_XPOS = True
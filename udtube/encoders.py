@@ -9,9 +9,12 @@ This module also includes two types of special-casing:
 Users are encouraged to file pull requests to fill this out.
 """
 
+import copy
+import functools
 import logging
 
 import transformers
+from transformers.models.auto import modeling_auto
 
 # The keys here are assumed to be prefixes of full name and should include
 # the organization name, a forward slash, and the shared prefix of the model.
@@ -33,12 +36,28 @@ SUPPORTED_ENCODERS = {
 }
 
 
+@functools.cache
+def load_config(model_name: str) -> transformers.PretrainedConfig:
+    """Loads the encoder configuration.
+
+    This is cached so that the configuration is only read once; callers
+    should therefore not modify it.
+
+    Args:
+        model_name (str): the Hugging Face model name.
+
+    Returns:
+        A Hugging Face configuration.
+    """
+    return transformers.AutoConfig.from_pretrained(model_name)
+
+
 def load(model_name: str, **kwargs) -> transformers.AutoModel:
     """Loads the encoder and applies any special casing.
 
     Args:
         model_name (str): the Hugging Face model name.
-        **kwargs: kwargs to be passed to the encoder constructor after any
+        **kwargs: kwargs to be set in the encoder configuration after any
             remapping.
 
     Returns:
@@ -59,6 +78,34 @@ def load(model_name: str, **kwargs) -> transformers.AutoModel:
             model_name,
             __file__,
         )
+    config = copy.deepcopy(load_config(model_name))
+    config.update({"output_hidden_states": True, **kwargs})
+    # Requests PyTorch's fused scaled dot-product attention, which avoids
+    # materializing the full attention matrix, for models that support it.
+    if _supports_sdpa(config):
+        attn_implementation = "sdpa"
+    else:
+        logging.info(
+            "Model %s does not support SDPA attention; using the default "
+            "attention implementation",
+            model_name,
+        )
+        attn_implementation = None
     return transformers.AutoModel.from_pretrained(
-        model_name, output_hidden_states=True, **kwargs
+        model_name, config=config, attn_implementation=attn_implementation
     )
+
+
+def _supports_sdpa(config: transformers.PretrainedConfig) -> bool:
+    """Determines whether the model supports SDPA attention.
+
+    Args:
+        config: the Hugging Face configuration.
+
+    Returns:
+        True if the model class resolved from the config supports SDPA.
+    """
+    if type(config) not in modeling_auto.MODEL_MAPPING:
+        return False
+    model_class = modeling_auto.MODEL_MAPPING[type(config)]
+    return getattr(model_class, "_supports_sdpa", False)
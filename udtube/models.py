@@ -35,6 +35,11 @@ class UDTube(lightning.LightningModule):
         use_xpos: Enables the language-specific POS tagging task.
         use_lemma: Enables the lemmatization task.
         use_feats: Enables the morphological feature tagging task.
+        compile_pooling: Compiles the pooling of the encoder layers with
+            `torch.compile`.
+        gradient_checkpointing: Enables gradient checkpointing in the
+            encoder, recomputing activations during the backward pass to
+            save memory.
     """
 
     encoder: modules.UDTubeEncoder
@@ -56,6 +61,8 @@ class UDTube(lightning.LightningModule):
         use_xpos: bool = defaults.USE_XPOS,
         use_lemma: bool = defaults.USE_LEMMA,
         use_feats: bool = defaults.USE_FEATS,
+        compile_pooling: bool = defaults.COMPILE_POOLING,
+        gradient_checkpointing: bool = defaults.GRADIENT_CHECKPOINTING,
         *,
         encoder_optimizer: cli.OptimizerCallable = defaults.OPTIMIZER,
         encoder_scheduler: cli.LRSchedulerCallable = defaults.SCHEDULER,
@@ -70,13 +77,19 @@ class UDTube(lightning.LightningModule):
         # See what this disables here:
         # https://lightning.ai/docs/pytorch/stable/model/manual_optimization.html#manual-optimization
         self.automatic_optimization = False
-        self.encoder = modules.UDTubeEncoder(dropout, encoder, pooling_layers)
+        self.encoder = modules.UDTubeEncoder(
+            dropout=dropout,
+            encoder=encoder,
+            pooling_layers=pooling_layers,
+            compile_pooling=compile_pooling,
+            gradient_checkpointing=gradient_checkpointing,
+        )
         self.classifier = modules.UDTubeClassifier(
-            self.encoder.hidden_size,
-            use_upos,
-            use_xpos,
-            use_lemma,
-            use_feats,
+            hidden_size=self.encoder.hidden_size,
+            use_upos=use_upos,
+            use_xpos=use_xpos,
+            use_lemma=use_lemma,
+            use_feats=use_feats,
             upos_out_size=upos_out_size,
             xpos_out_size=xpos_out_size,
             lemma_out_size=lemma_out_size,
@@ -166,12 +179,15 @@ class UDTube(lightning.LightningModule):
         batch: data.Batch,
         batch_idx: int,
     ) -> None:
-        for optimizer in self.optimizers():
+        # The encoder and classifier optimizers are stepped together; this
+        # fetches (and wraps) them once per step rather than twice.
+        optimizers = self.optimizers()
+        for optimizer in optimizers:
             optimizer.zero_grad()
         logits = self(batch)
         loss = self._log_loss(logits, batch, "train")
         self.manual_backward(loss)
-        for optimizer in self.optimizers():
+        for optimizer in optimizers:
             optimizer.step()
 
     def on_train_epoch_end(self) -> None:
@@ -5,10 +5,10 @@ for a classification head, and L is the maximum length (in subwords, tokens,
 or tags) of a sentence in the batch.
 """
 
-from typing import List, Optional
+import functools
+from typing import Callable, List, Tuple
 
 import lightning
-import tokenizers
 import torch
 from torch import nn
 import transformers
@@ -20,6 +20,53 @@ class Error(Exception):
     pass
 
 
+def _pool_layers(
+    layers: Tuple[torch.Tensor, ...], dropout: float, training: bool
+) -> torch.Tensor:
+    """Averages the pooling layers and applies dropout.
+
+    This is a free function, rather than a method, so that its compiled
+    version holds no reference to the module.
+
+    Args:
+        layers: the encoder layers to pool.
+        dropout: dropout probability.
+        training: whether the model is in training mode.
+
+    Returns:
+        The pooled subword embeddings.
+    """
+    if len(layers) == 1:
+        x = layers[0]
+    else:
+        # This sums the layers into a single accumulator rather than
+        # stacking them, which would allocate a new tensor holding all of
+        # them.
+        x = layers[-1].clone()
+        for layer in layers[:-1]:
+            x.add_(layer)
+        x.div_(len(layers))
+    # Under mixed precision, the layers are averaged in full precision but
+    # the subsequent memory-bound steps are run in the reduced precision
+    # that the classifier heads would be cast to anyway.
+    if torch.is_autocast_enabled(x.device.type):
+        x = x.to(torch.get_autocast_dtype(x.device.type))
+    # Dropout is a no-op at inference time, so we skip it altogether.
+    if training and dropout > 0:
+        x = nn.functional.dropout(x, dropout, training)
+    return x
+
+
+@functools.cache
+def _compiled_pool_layers() -> Callable[..., torch.Tensor]:
+    """Compiles `_pool_layers` on first use.
+
+    The shapes vary from batch to batch, so the compiled graph is made dynamic
+    to prevent recompilation.
+    """
+    return torch.compile(_pool_layers, dynamic=True)
+
+
 class UDTubeEncoder(lightning.LightningModule):
     """Encoder portion of the model.
 
@@ -27,30 +74,39 @@ class UDTubeEncoder(lightning.LightningModule):
         dropout: Dropout probability.
         encoder: Name of the Hugging Face model used to tokenize and encode.
         pooling_layers: Number of layers to use to compute the embedding.
+        compile_pooling: Compiles the pooling of the encoder layers with
+            `torch.compile`.
+        gradient_checkpointing: Enables gradient checkpointing in the
+            encoder, recomputing activations during the backward pass to
+            save memory.
     """
 
     dropout_layer: nn.Dropout
     encoder: transformers.AutoModel
+    hidden_size: int
     pooling_layers: int
+    compile_pooling: bool
 
     def __init__(
         self,
         dropout: float = defaults.DROPOUT,
         encoder: str = defaults.ENCODER,
         pooling_layers: int = defaults.POOLING_LAYERS,
+        compile_pooling: bool = defaults.COMPILE_POOLING,
+        gradient_checkpointing: bool = defaults.GRADIENT_CHECKPOINTING,
     ):
         super().__init__()
         self.dropout_layer = nn.Dropout(dropout)
         # TODO: Any parameters referenced in the remappings in
         # encoders.SUPPORTED_ENCODERS need to be passed as kwargs here.
         self.encoder = encoders.load(encoder, dropout=dropout)
+        if gradient_checkpointing:
+            self.encoder.gradient_checkpointing_enable(
+                gradient_checkpointing_kwargs={"use_reentrant": False}
+            )
+        self.hidden_size = self.encoder.config.hidden_size
         self.pooling_layers = pooling_layers
-
-    # Properties.
-
-    @property
-    def hidden_size(self) -> int:
-        return self.encoder.config.hidden_size
+        self.compile_pooling = compile_pooling
 
     def forward(
         self,
@@ -59,7 +115,7 @@ class UDTubeEncoder(lightning.LightningModule):
         """Computes the contextual word-level encoding.
 
         This discards over-long sequences (if necessary), computes the subword
-        encodings, stacks and mean-pools the pooling layers, applies dropout,
+        encodings, mean-pools the pooling layers, applies dropout,
         and then mean-pools the subwords that make up each word.
 
         Args:
@@ -68,83 +124,58 @@ class UDTubeEncoder(lightning.LightningModule):
         Returns:
             A contextual word-level encoding.
         """
-        # We move these manually.
-        x = self.encoder(
-            batch.input_ids.to(self.device),
-            batch.attention_mask.to(self.device),
-        ).hidden_states
-        # Stacks the pooling layers.
-        x = torch.stack(x[-self.pooling_layers :])
-        # Averages them into one embedding layer; automatically squeezes the
-        # mean dimension.
-        x = torch.mean(x, dim=0)
-        # Applies dropout.
-        x = self.dropout_layer(x)
+        x = self.encoder(batch.input_ids, batch.attention_mask).hidden_states
+        # Mean-pools the pooling layers and applies dropout.
+        pool_layers = (
+            _compiled_pool_layers() if self.compile_pooling else _pool_layers
+        )
+        x = pool_layers(
+            x[-self.pooling_layers :], self.dropout_layer.p, self.training
+        )
         # Maps from subword embeddings to word-level embeddings.
-        x = self._group_embeddings(x, batch.encodings)
+        x = self._group_embeddings(
+            x,
+            batch.subword_indices,
+            batch.word_offsets,
+            batch.word_counts,
+        )
         return x
 
+    @staticmethod
+    @torch.jit.script_if_tracing
     def _group_embeddings(
-        self,
         embeddings: torch.Tensor,
-        encodings: List[tokenizers.Encoding],
+        subword_indices: torch.Tensor,
+        word_offsets: torch.Tensor,
+        word_counts: List[int],
     ) -> torch.Tensor:
         """Groups subword embeddings to form word embeddings.
 
         This is necessary because each classifier head makes per-word
         decisions, but the contextual embeddings use subwords. Therefore,
-        we average over the subwords for each word.
+        we average over the subwords for each word. Each word is treated as
+        a bag of rows of the flattened subword embeddings so that this can
+        be computed for the whole batch with a single embedding bag call.
 
         Args:
             embeddings: the embeddings tensor to pool.
-            encodings: the tokenizer encodings.
+            subword_indices: flattened indices of the non-padding subwords.
+            word_offsets: offset into `subword_indices` of the first subword
+                of each word.
+            word_counts: number of words in each sentence.
 
         Returns:
             The re-pooled embeddings tensor.
         """
-        new_sentence_embeddings = []
-        for sentence_encodings, sentence_embeddings in zip(
-            encodings, embeddings
-        ):
-            # This looks like an overly elaborate loop that could be a list
-            # comprehension, but this is much faster.
-            indices = []
-            i = 0
-            while i < len(sentence_encodings.word_ids):
-                word_id = sentence_encodings.word_ids[i]
-                # Have hit padding.
-                if word_id is None:
-                    break
-                pair = sentence_encodings.word_to_tokens(word_id)
-                indices.append(pair)
-                # Fast-forwards to the start of the next word.
-                i = pair[-1]
-            # For each span of subwords, combine via mean and then stack them.
-            new_sentence_embeddings.append(
-                torch.stack(
-                    [
-                        torch.mean(sentence_embeddings[start:end], dim=0)
-                        for start, end in indices
-                    ]
-                )
-            )
-        # Pads and stacks across sentences; the leading dimension is ragged
-        # but `pad` cowardly refuses to pad non-trailing dimensions, so we
-        # abuse transposition and permutation.
-        pad_max = max(
-            len(sentence_embedding)
-            for sentence_embedding in new_sentence_embeddings
+        word_embeddings = nn.functional.embedding_bag(
+            subword_indices,
+            embeddings.reshape(-1, embeddings.size(-1)),
+            word_offsets,
+            mode="mean",
+        )
+        return nn.utils.rnn.pad_sequence(
+            torch.split(word_embeddings, word_counts), batch_first=True
         )
-        return torch.stack(
-            [
-                nn.functional.pad(
-                    sentence_embedding.T,
-                    (0, pad_max - len(sentence_embedding)),
-                    value=0,
-                )
-                for sentence_embedding in new_sentence_embeddings
-            ]
-        ).permute(0, 2, 1)
 
 
 class UDTubeClassifier(lightning.LightningModule):
@@ -162,10 +193,12 @@ class UDTubeClassifier(lightning.LightningModule):
         feats_out_size: number of FEATS classes; usually set automatically.
     """
 
-    upos_head: Optional[nn.Sequential]
-    xpos_head: Optional[nn.Sequential]
-    lemma_head: Optional[nn.Sequential]
-    feats_head: Optional[nn.Sequential]
+    use_upos: bool
+    use_xpos: bool
+    use_lemma: bool
+    use_feats: bool
+    out_sizes: List[int]
+    head: nn.Linear
 
     def __init__(
         self,
@@ -180,42 +213,60 @@ class UDTubeClassifier(lightning.LightningModule):
         xpos_out_size: int = 2,
         lemma_out_size: int = 2,
         feats_out_size: int = 2,
-        # Optimization and LR scheduling.
-        **kwargs,
     ):
         super().__init__()
         if not any([use_upos, use_xpos, use_lemma, use_feats]):
             raise Error("No classification heads enabled")
-        self.upos_head = (
-            nn.Linear(hidden_size, upos_out_size) if use_upos else None
-        )
-        self.xpos_head = (
-            nn.Linear(hidden_size, xpos_out_size) if use_xpos else None
-        )
-        self.lemma_head = (
-            nn.Linear(hidden_size, lemma_out_size) if use_lemma else None
-        )
-        self.feats_head = (
-            nn.Linear(hidden_size, feats_out_size) if use_feats else None
+        self.use_upos = use_upos
+        self.use_xpos = use_xpos
+        self.use_lemma = use_lemma
+        self.use_feats = use_feats
+        # The active heads share a single linear layer whose output is split
+        # into per-head logits, so that there is one matrix multiplication
+        # rather than one per head.
+        self.out_sizes = [
+            out_size
+            for out_size, use in [
+                (upos_out_size, use_upos),
+                (xpos_out_size, use_xpos),
+                (lemma_out_size, use_lemma),
+                (feats_out_size, use_feats),
+            ]
+            if use
+        ]
+        # The fused weights are drawn one head at a time, as if the heads
+        # were separate linear layers, so that seeded runs initialize them
+        # exactly as before they were fused.
+        heads = [
+            nn.Linear(hidden_size, out_size) for out_size in self.out_sizes
+        ]
+        self.head = nn.utils.skip_init(
+            nn.Linear, hidden_size, sum(self.out_sizes)
         )
-
-    # Properties.
-
-    @property
-    def use_upos(self) -> bool:
-        return self.upos_head is not None
-
-    @property
-    def use_xpos(self) -> bool:
-        return self.xpos_head is not None
-
-    @property
-    def use_lemma(self) -> bool:
-        return self.lemma_head is not None
-
-    @property
-    def use_feats(self) -> bool:
-        return self.feats_head is not None
+        with torch.no_grad():
+            self.head.weight.copy_(torch.cat([head.weight for head in heads]))
+            self.head.bias.copy_(torch.cat([head.bias for head in heads]))
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Checkpoints written before the heads were fused store a separate
+        # linear layer for each active head; these are concatenated, in the
+        # same order as `out_sizes`, to form the fused head.
+        old_heads = [
+            f"{prefix}{name}_head"
+            for name, use in [
+                ("upos", self.use_upos),
+                ("xpos", self.use_xpos),
+                ("lemma", self.use_lemma),
+                ("feats", self.use_feats),
+            ]
+            if use
+        ]
+        if f"{old_heads[0]}.weight" in state_dict:
+            for param in ["weight", "bias"]:
+                state_dict[f"{prefix}head.{param}"] = torch.cat(
+                    [state_dict.pop(f"{head}.{param}") for head in old_heads]
+                )
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
 
     # Forward pass.
 
@@ -223,9 +274,12 @@ class UDTubeClassifier(lightning.LightningModule):
         """Computes logits for each of the classification heads.
 
         This takes the contextual word encodings and then computes the logits
-        for each of the active classification heads. This yields logits of the
-        shape N x L x C. Loss and accuracy functions expect N x C x L, so we
-        permute to produce this shape.
+        for each of the active classification heads. Loss and accuracy
+        functions expect logits of the shape N x C x L, so rather than
+        applying the fused head to the N x L x H encodings and permuting the
+        result, we multiply its weights by the encodings transposed to
+        N x H x L, which yields logits of this shape directly. These are then
+        split into the per-head logits.
 
         Args:
             encodings: the contextual word
@@ -233,25 +287,16 @@ class UDTubeClassifier(lightning.LightningModule):
         Returns:
             A contextual word-level encoding.
         """
+        logits = torch.matmul(self.head.weight, encodings.transpose(1, 2))
+        # Under mixed precision, the bias is cast so that adding it does not
+        # promote the logits back to full precision.
+        logits = logits + self.head.bias.unsqueeze(-1).to(logits.dtype)
+        # Splits the fused logits in the same order as the heads are listed
+        # in `out_sizes`.
+        logits = iter(logits.split(self.out_sizes, dim=1))
         return data.Logits(
-            upos=(
-                self.upos_head(encodings).permute(0, 2, 1)
-                if self.use_upos
-                else None
-            ),
-            xpos=(
-                self.xpos_head(encodings).permute(0, 2, 1)
-                if self.use_xpos
-                else None
-            ),
-            lemma=(
-                self.lemma_head(encodings).permute(0, 2, 1)
-                if self.use_lemma
-                else None
-            ),
-            feats=(
-                self.feats_head(encodings).permute(0, 2, 1)
-                if self.use_feats
-                else None
-            ),
+            upos=next(logits) if self.use_upos else None,
+            xpos=next(logits) if self.use_xpos else None,
+            lemma=next(logits) if self.use_lemma else None,
+            feats=next(logits) if self.use_feats else None,
         )